@@ -1,34 +1,61 @@
-from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect, Form
+from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect, Form, Request, Depends
 import aiohttp
 import websockets
 import asyncio
 from fastapi.responses import StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 import uvicorn
-from bs4 import BeautifulSoup
-import os, io
+from selectolax.lexbor import LexborHTMLParser
+import os, io, sys
+import logging
+import ssl
+from collections import defaultdict
+from functools import lru_cache
+from cachetools import TTLCache
 from starlette.responses import JSONResponse
-from openai import AsyncOpenAI
 from dotenv import load_dotenv
-from pydantic import BaseModel
-import json
+import msgspec
+import orjson
 from fastapi import UploadFile, File
 import tempfile
 
 from stt import transcribe_audio_file
 from tts import chat_with_openai, text_to_speech_stream
-from realtime import create_realtime_session
+from realtime import create_realtime_session, log_base64_backend
+from http_session import get_http_session, close_http_session
 
-# --- Pydantic Model for Incoming Requests ---
-class PageRequest(BaseModel):
+# --- Request Model for Incoming Requests ---
+class PageRequest(msgspec.Struct):
     page_name: str
 
-# Load environment variables from a .env file
-load_dotenv()
+_PAGE_REQUEST_DECODER = msgspec.json.Decoder(PageRequest)
+
+# FastAPI can't see a body read inside a dependency, so document it in the OpenAPI schema by hand;
+# the msgspec schema is inlined because its "#/$defs" refs don't resolve in an OpenAPI document
+_PAGE_REQUEST_OPENAPI = {
+    "requestBody": {
+        "required": True,
+        "content": {"application/json": {"schema": msgspec.json.schema(PageRequest)["$defs"]["PageRequest"]}},
+    }
+}
+
+async def parse_page_request(request: Request) -> PageRequest:
+    """
+    Decodes and validates a PageRequest JSON body with msgspec.
+    """
+    try:
+        return _PAGE_REQUEST_DECODER.decode(await request.body())
+    except msgspec.DecodeError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+# Load environment variables from a .env file unless the key is already set
+if not os.getenv("OPENAI_API_KEY"):
+    load_dotenv()
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 
-# --- OpenAI Initialization ---
-client = AsyncOpenAI(api_key=OPENAI_API_KEY)
+# --- Logging: LOG_LEVEL=WARNING in production skips formatting of info records entirely ---
+logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO"), format="[%(levelname)s] %(name)s: %(message)s")
+logger = logging.getLogger(__name__)
 
 # Get the directory where this script is located
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -38,6 +65,93 @@ DEFAULT_INSTRUCTIONS = "You are a friendly and helpful voice assistant. Be conve
 if not OPENAI_API_KEY:
     raise ValueError("OPENAI_API_KEY environment variable not set")
 
+# --- Tags collected into the "headings" context field ---
+HEADING_TAGS = frozenset(('h1', 'h2', 'h3', 'h4', 'h5', 'h6'))
+
+# --- Cap on the page's plain text sent in Realtime instructions, to bound prompt tokens ---
+MAX_FULLTEXT_CHARS = int(os.getenv("MAX_FULLTEXT_CHARS", "4000"))
+
+# --- CSS classes that mark a button/link as a primary action ---
+ACTION_CLASSES = frozenset(('bg-blue-600', 'bg-green-600'))
+
+# --- Selectors used by the page parsers, built once instead of per request ---
+_NAV_LINKS_SELECTOR = 'nav a'
+_MAIN_TOPICS_SELECTOR = 'h2, h3'
+# The class filter lives in the selector, so matching happens inside Lexbor
+_ACTIONS_SELECTOR = ':is(button, a):is(%s)' % ', '.join(f'.{cls}' for cls in sorted(ACTION_CLASSES))
+# Elements whose text is not page content
+_NON_CONTENT_TAGS = ['script', 'style', 'noscript', 'template']
+
+# --- Knowledge Base Prompt and Cache ---
+PROMPT_1_SYSTEM = """
+    You are an expert content analyst. Your task is to create a detailed, structured knowledge summary from a webpage's data. 
+    This summary will be the sole source of truth for a conversational voice assistant.
+    Synthesize the provided information into a factual knowledge base. Use the following headings:
+    ### Page Purpose
+    [Briefly state the main goal or topic of this page.]
+    ### Navigation Options
+    [List all available navigation links and their likely purpose.]
+    ### Key Content
+    [Describe the primary topics, sections, and data points mentioned on the page.]
+    ### User Actions
+    [Detail any interactive elements like buttons or forms and what they do.]
+    """
+_PROMPT1_HASH = hash(PROMPT_1_SYSTEM)
+
+# --- Prompt and session templates, built once; only the page-specific fields are filled in per request ---
+PROMPT_2_SYSTEM_TEMPLATE = """
+    You are a friendly voice assistant. Your goal is to give a quick, helpful overview of the current page, '{page_title}'. 
+    Use the provided 'PAGE KNOWLEDGE BASE' to generate a spoken welcome message that must be less than 10 seconds long.
+    Your message should cover what the page is about and what the user can do must include the navigation options and headers. 
+    Be conversational and end your message with the exact phrase: 'how may I assist you today?'
+    ---
+    PAGE KNOWLEDGE BASE:
+    {detailed_knowledge_base}
+    ---
+    """
+
+_INSTRUCTIONS_TEMPLATE = """You are a helpful voice assistant for the webpage '{page_title}'. 
+                    Your knowledge is strictly limited to the information provided below.
+
+                    PAGE CONTEXT:
+                    {page_context}
+
+                    Rules:
+                    1. Be brief but complete - keep responses under 7 seconds,  and make it as to the point as possible.
+                    2. Only answer questions about the page content above
+                    3. If asked about anything not on this page, say: "I can only answer questions about the content on this page. You could ask me about our core technologies, for example."
+                    4. Be conversational and helpful
+                    5. Always give responce to the point not a long story.
+                    6. If the user language is hindi, speek hindi but not perfect hindi that user wont understand, use basic hindi only.
+                    """
+
+# Realtime session.update sent on every /ws/realtime connection, minus the per-page "instructions"
+_SESSION_CONFIG_TEMPLATE = {
+    "type": "session.update",
+    "session": {
+        "modalities": ["text", "audio"],
+        "voice": "shimmer",
+        "input_audio_format": "pcm16",
+        "output_audio_format": "pcm16",
+        "input_audio_transcription": {"model": "whisper-1"},
+        "turn_detection": {
+            "type": "server_vad",
+            "threshold": 0.5,
+            "prefix_padding_ms": 300,
+            "silence_duration_ms": 200
+        },
+        "temperature": 0.8,
+        "max_response_output_tokens": 500
+    }
+}
+
+# Knowledge bases keyed on (page_name, mtime_ns, prompt hash); an edit to the page or prompt misses the cache.
+KB_CACHE: TTLCache = TTLCache(maxsize=256, ttl=3600)
+
+# --- Upstream Realtime WebSocket settings ---
+# One TLS context for every upstream connection, so CA certificates are loaded once
+_SSL_CONTEXT = ssl.create_default_context()
+
 # --- FastAPI App Initialization ---
 app = FastAPI()
 
@@ -49,180 +163,204 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.on_event("startup")
+async def open_http_session():
+    # Open the shared aiohttp session up front so the first request doesn't pay for it
+    await get_http_session()
+
+@app.on_event("startup")
+async def enable_eager_tasks():
+    # Python 3.12+: a task whose coroutine finishes without blocking (e.g. a websocket send
+    # that doesn't wait) completes inline instead of waiting for the next loop iteration
+    if sys.version_info >= (3, 12):
+        asyncio.get_running_loop().set_task_factory(asyncio.eager_task_factory)
+
+@app.on_event("startup")
+async def log_audio_encoder():
+    # Runs after logging.basicConfig, so LOG_LEVEL=DEBUG shows the selected base64 ISA
+    log_base64_backend()
+
+@app.on_event("shutdown")
+async def shutdown_http_session():
+    await close_http_session()
+
 # --- CORE LOGIC: Parse HTML to get plain text ---
-def get_structured_page_data_for_summarize_and_speak(filename: str):
+def _stat_page(filename: str):
     """
-    Reads index.html and extracts structured data about its purpose,
-    navigation, and actions.
+    Resolves a page name to its path and returns (file_path, mtime_ns).
+    The mtime is used as the cache key so edits to the HTML are picked up.
     """
     file_path = os.path.join(BASE_DIR, filename)
-    
-    if not os.path.exists(file_path):
-        raise HTTPException(status_code=404, detail=f"File '{filename}' not found at path '{file_path}'.")
     try:
-        with open(file_path, "r", encoding="utf-8") as f:
-            html_content = f.read()
-        soup = BeautifulSoup(html_content, 'lxml')
-
-
-        # Extract key pieces of information dynamically
-        title = soup.find('title').get_text(strip=True) if soup.find('title') else "Untitled Page"
-        
-        # Find all navigation links
-        all_nav_links = []
-        for nav in soup.find_all('nav'):
-            all_nav_links.extend([a.get_text(strip=True) for a in nav.find_all('a')])
-        
-        # Find all headings to identify main topics
-        main_topics = [h.get_text(strip=True) for h in soup.find('main').find_all(['h2', 'h3'])] if soup.find('main') else []
-        
-        # Find all potential action buttons/links
-        actions = [btn.get_text(strip=True) for btn in soup.find_all(['button', 'a']) if btn.get('class') and ('bg-blue-600' in btn.get('class') or 'bg-green-600' in btn.get('class'))]
-
-        # Combine the data into a context string for the AI
-        context = f"""
-        - Page Title: "{title}"
-        - Main Topics Covered: {', '.join(main_topics) or "N/A"}
-        - Available Navigation Links: {', '.join(list(set(all_nav_links))) or "N/A"}
-        - Potential Actions on Page: {', '.join(actions) or "N/A"}
-        """
-        return context, title
-
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"An error occurred while parsing HTML: {str(e)}")
+        mtime_ns = os.stat(file_path).st_mtime_ns
+    except OSError:
+        raise HTTPException(status_code=404, detail=f"File '{filename}' not found at path '{file_path}'.")
+    return file_path, mtime_ns
 
 
-def get_structured_page_data_for_realtime(filename: str):
+@lru_cache(maxsize=64)
+def _cached_structured(file_path: str, mtime_ns: int):
     """
-    Extracts a comprehensive set of details from the HTML content of a webpage.
+    Parses the page once per (file_path, mtime_ns) and returns (context, title, summary_context).
+    context is the realtime prompt string, rendered once so every session reuses the same str object;
+    summary_context is the /summarize-and-speak string.
     """
-    file_path = os.path.join(BASE_DIR, filename)
-    
-    if not os.path.exists(file_path):
-        raise HTTPException(status_code=404, detail=f"File '{filename}' not found at path '{file_path}'.")
     try:
-        with open(file_path, "r", encoding="utf-8") as f:
+        with open(file_path, "rb") as f:
             html_content = f.read()
-        soup = BeautifulSoup(html_content, 'html.parser')
+        tree = LexborHTMLParser(html_content)
 
-        # 1. Page Title (already good)
-        title = soup.find('title').get_text(strip=True) if soup.find('title') else "Untitled Page"
-
-        # 2. Meta Information (Description and Keywords are very important)
-        description = soup.find('meta', attrs={'name': 'description'})
-        keywords = soup.find('meta', attrs={'name': 'keywords'})
-        
-        meta_description = description['content'] if description and description.has_attr('content') else "N/A"
-        meta_keywords = keywords['content'] if keywords and keywords.has_attr('content') else "N/A"
-
-        # 3. All Headings (h1 through h6) to understand structure
-        all_headings = {f'h{i}': [] for i in range(1, 7)}
-        for i in range(1, 7):
-            for heading in soup.find_all(f'h{i}'):
-                all_headings[f'h{i}'].append(heading.get_text(strip=True))
-
-        # 4. All Links on the entire page, not just in <nav>
-        # We store them in a dictionary to keep text and URL together
+        title = None
+        meta_tags = {}
+        all_headings = defaultdict(list)
         all_links = {}
-        for link in soup.find_all('a', href=True):
-            text = link.get_text(strip=True)
-            href = link['href']
-            if text and href and not href.startswith('#'):
-                all_links[text] = href
-
-        # 5. Extract all plain text content for context, Use a separator to make the text more readable
-        full_text_content = soup.get_text(separator='\n', strip=True)
-
-        # 6. Extract Image Descriptions (alt text) for accessibility and context
-        image_descriptions = [img['alt'] for img in soup.find_all('img') if img.has_attr('alt') and img['alt']]
-
-        # 7. A more robust way to find "Actions"
-        potential_actions = []
-        for action_tag in soup.find_all(['button', 'a']):
-            text = action_tag.get_text(strip=True)
-            if not text:
-                continue
-            # Check if it's a button tag or an 'a' tag with a button-like role or class
-            if action_tag.name == 'button' or (action_tag.has_attr('role') and 'button' in action_tag['role']):
-                potential_actions.append(text)
-        
+        # Keys of these dicts act as insertion-ordered sets
+        image_descriptions = {}
+        potential_actions = {}
+
+        # Walk the tree once and dispatch on the tag name instead of running
+        # a separate search for every kind of element.
+        for node in tree.root.traverse():
+            tag = node.tag
+
+            # 1. All Headings (h1 through h6) to understand structure
+            if tag in HEADING_TAGS:
+                all_headings[tag].append(node.text(strip=True))
+
+            # 2. All Links on the entire page, not just in <nav>, plus 'a' tags with a button-like role
+            elif tag == 'a':
+                text = node.text(strip=True)
+                if not text:
+                    continue
+                href = node.attributes.get('href')
+                if href and not href.startswith('#'):
+                    all_links[text] = href
+                if 'button' in (node.attributes.get('role') or ''):
+                    potential_actions[text] = None
+
+            # 3. Buttons are always treated as actions
+            elif tag == 'button':
+                text = node.text(strip=True)
+                if text:
+                    potential_actions[text] = None
+
+            # 4. Image Descriptions (alt text) for accessibility and context
+            elif tag == 'img':
+                alt = node.attributes.get('alt')
+                if alt:
+                    image_descriptions[alt] = None
+
+            # 5. Meta Information (Description and Keywords are very important)
+            elif tag == 'meta':
+                name = node.attributes.get('name')
+                if name in ('description', 'keywords'):
+                    meta_tags.setdefault(name, node.attributes)
+
+            # 6. Page Title
+            elif tag == 'title' and title is None:
+                title = node.text(strip=True)
+
+        title = title if title is not None else "Untitled Page"
+        meta_description = meta_tags['description'].get('content') if 'content' in meta_tags.get('description', {}) else "N/A"
+        meta_keywords = meta_tags['keywords'].get('content') if 'content' in meta_tags.get('keywords', {}) else "N/A"
+
+        # 7. Navigation links, main topics and primary (styled) actions, used for the page summary
+        navigation_links = dict.fromkeys(a.text(strip=True) for a in tree.css(_NAV_LINKS_SELECTOR))
+        main = tree.css_first('main')
+        main_topics = [h.text(strip=True) for h in main.css(_MAIN_TOPICS_SELECTOR)] if main else []
+        primary_actions = [btn.text(strip=True) for btn in tree.css(_ACTIONS_SELECTOR)]
+
+        # 8. Extract all plain text content for context, Use a separator to make the text more readable
+        tree.strip_tags(_NON_CONTENT_TAGS)
+        raw_text = tree.root.text(separator='\n', strip=True) if tree.root else ""
+        full_text_content = '\n'.join(line for line in raw_text.split('\n') if line)[:MAX_FULLTEXT_CHARS]
+
         # --- Combine data into a more structured dictionary ---
         context = {
             "title": title,
             "meta_description": meta_description,
             "meta_keywords": meta_keywords,
-            "headings": all_headings,
+            "headings": {tag: all_headings[tag] for tag in sorted(all_headings)},
             "links": all_links,
-            "image_alt_texts": list(set(image_descriptions)),
-            "actions": list(set(potential_actions)),
+            "image_alt_texts": list(image_descriptions),
+            "actions": list(potential_actions),
             "full_text": full_text_content
         }
+        summary_context = _to_summary_context(title, main_topics, list(navigation_links), primary_actions)
         
-        return context, title
+        return str(context), title, summary_context
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"An error occurred while parsing HTML: {str(e)}")
 
 
-# Summarize Text and Convert to Speech ---
-@app.post("/summarize-and-speak")
-async def summarize_and_speak(request: PageRequest):
-    print(f"Request received for page: {request.page_name}")
-    page_context, page_title = get_structured_page_data_for_summarize_and_speak(request.page_name)
+async def get_structured_page_data_for_realtime(filename: str):
+    """
+    Extracts a comprehensive set of details from the HTML content of a webpage.
+    """
+    # Parsing is blocking work, so keep it off the event loop
+    loop = asyncio.get_running_loop()
+    context, title, _ = await loop.run_in_executor(None, _cached_structured, *_stat_page(filename))
+    return context, title
 
-    prompt_1_system = """
-    You are an expert content analyst. Your task is to create a detailed, structured knowledge summary from a webpage's data. 
-    This summary will be the sole source of truth for a conversational voice assistant.
-    Synthesize the provided information into a factual knowledge base. Use the following headings:
-    ### Page Purpose
-    [Briefly state the main goal or topic of this page.]
-    ### Navigation Options
-    [List all available navigation links and their likely purpose.]
-    ### Key Content
-    [Describe the primary topics, sections, and data points mentioned on the page.]
-    ### User Actions
-    [Detail any interactive elements like buttons or forms and what they do.]
+
+def _to_summary_context(title: str, main_topics: list, navigation_links: list, primary_actions: list) -> str:
     """
+    Formats the summary-only page data into the short context string used by /summarize-and-speak.
+    """
+    return f"""
+        - Page Title: "{title}"
+        - Main Topics Covered: {', '.join(main_topics) or "N/A"}
+        - Available Navigation Links: {', '.join(navigation_links) or "N/A"}
+        - Potential Actions on Page: {', '.join(primary_actions) or "N/A"}
+        """
 
-    detailed_knowledge_base = await chat_with_openai(f"Page info:\n{page_context}", system_prompt=prompt_1_system)
-    if not detailed_knowledge_base:
-        raise HTTPException(status_code=500, detail="Failed to generate knowledge base.")
-    print("[SUCCESS] Detailed knowledge base created.")
+
+# Summarize Text and Convert to Speech ---
+@app.post("/summarize-and-speak", openapi_extra=_PAGE_REQUEST_OPENAPI)
+async def summarize_and_speak(request: PageRequest = Depends(parse_page_request)):
+    logger.info("Request received for page: %s", request.page_name)
+    file_path, mtime_ns = _stat_page(request.page_name)
+    _, page_title, page_context = await asyncio.get_running_loop().run_in_executor(
+        None, _cached_structured, file_path, mtime_ns
+    )
+
+    kb_key = (request.page_name, mtime_ns, _PROMPT1_HASH)
+    detailed_knowledge_base = KB_CACHE.get(kb_key)
+    if detailed_knowledge_base:
+        logger.info("Reusing cached knowledge base.")
+    else:
+        detailed_knowledge_base = await chat_with_openai(f"Page info:\n{page_context}", system_prompt=PROMPT_1_SYSTEM)
+        if not detailed_knowledge_base:
+            raise HTTPException(status_code=500, detail="Failed to generate knowledge base.")
+        KB_CACHE[kb_key] = detailed_knowledge_base
+        logger.info("Detailed knowledge base created.")
     # For debugging
-    # print(f"--- KNOWLEDGE BASE ---\n{detailed_knowledge_base}\n--------------------")
+    # logger.debug("--- KNOWLEDGE BASE ---\n%s\n--------------------", detailed_knowledge_base)
     
-    prompt_2_system = f"""
-    You are a friendly voice assistant. Your goal is to give a quick, helpful overview of the current page, '{page_title}'. 
-    Use the provided 'PAGE KNOWLEDGE BASE' to generate a spoken welcome message that must be less than 10 seconds long.
-    Your message should cover what the page is about and what the user can do must include the navigation options and headers. 
-    Be conversational and end your message with the exact phrase: 'how may I assist you today?'
-    ---
-    PAGE KNOWLEDGE BASE:
-    {detailed_knowledge_base}
-    ---
-    """
+    prompt_2_system = PROMPT_2_SYSTEM_TEMPLATE.format(page_title=page_title, detailed_knowledge_base=detailed_knowledge_base)
     conversational_summary_text = await chat_with_openai("Generate the welcome message now.", system_prompt=prompt_2_system)
     if not conversational_summary_text:
         raise HTTPException(status_code=500, detail="Failed to get summary from chat model.")
 
-    print(f"[SUCCESS] Guided summary received: {conversational_summary_text}")
+    logger.info("Guided summary received: %s", conversational_summary_text)
     
     audio_stream_generator = text_to_speech_stream(conversational_summary_text)
     
-    print("Audio generated. Streaming response to client.")
+    logger.info("Audio generated. Streaming response to client.")
     return StreamingResponse(audio_stream_generator, media_type="audio/mpeg")
 
 
-@app.post("/create-talk-session")
-async def create_talk_session(request: PageRequest):
+@app.post("/create-talk-session", openapi_extra=_PAGE_REQUEST_OPENAPI)
+async def create_talk_session(request: PageRequest = Depends(parse_page_request)):
     """
     Creates a real-time session with OpenAI and returns the client_secret 
     for the frontend to connect directly.
     """
-    print(f"Creating Realtime session for page: {request.page_name}")
+    logger.info("Creating Realtime session for page: %s", request.page_name)
     
     try:
         # Get page context for the session
-        page_context, page_title = get_structured_page_data_for_realtime(request.page_name)
+        page_context, page_title = await get_structured_page_data_for_realtime(request.page_name)
         
         # Create Realtime session with page-specific context
         session_info = await create_realtime_session(page_context, page_title)
@@ -230,11 +368,11 @@ async def create_talk_session(request: PageRequest):
         if not session_info:
             raise HTTPException(status_code=500, detail="Failed to create OpenAI Realtime session")
 
-        print(f"Successfully created Realtime session. Returning session info.")
+        logger.info("Successfully created Realtime session. Returning session info.")
         return JSONResponse(session_info)
 
     except Exception as e:
-        print(f"An unexpected error occurred in session creation: {e}")
+        logger.error("An unexpected error occurred in session creation: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.websocket("/ws/realtime")
@@ -247,21 +385,20 @@ async def websocket_proxy(websocket: WebSocket):
     try:
         # Receive the client_secret, model, and page info from the client
         init_message = await websocket.receive_text()
-        import json
-        init_data = json.loads(init_message)
+        init_data = orjson.loads(init_message)
         client_secret = init_data.get("client_secret")
         model = init_data.get("model", "gpt-realtime")
         page_name = init_data.get("page_name", "index.html")
         
         if not client_secret:
-            await websocket.send_text(json.dumps({"error": "Missing client_secret"}))
+            await websocket.send_text(orjson.dumps({"error": "Missing client_secret"}).decode())
             await websocket.close()
             return
         
-        print(f"[INFO] Connecting to OpenAI Realtime API with client_secret: {client_secret}, model: {model}")
+        logger.info("Connecting to OpenAI Realtime API with client_secret: %s, model: %s", client_secret, model)
         
         # Get page context for instructions
-        page_context, page_title = get_structured_page_data_for_realtime(page_name)
+        page_context, page_title = await get_structured_page_data_for_realtime(page_name)
         
         # Connect to OpenAI Realtime API with authentication using main API key
         openai_ws_url = f"wss://api.openai.com/v1/realtime?model={model}"
@@ -275,73 +412,64 @@ async def websocket_proxy(websocket: WebSocket):
         async with websockets.connect(
             openai_ws_url,
             additional_headers=extra_headers,
+            ssl=_SSL_CONTEXT,
+            compression=None,
+            max_size=None,
+            ping_interval=20,
             open_timeout=30,
             close_timeout=10
         ) as openai_ws:
-            print("[SUCCESS] Connected to OpenAI Realtime API")
+            logger.info("Connected to OpenAI Realtime API")
             
             # Send session configuration with page-specific instructions
-            session_config = {
-                "type": "session.update",
+            session_config = _SESSION_CONFIG_TEMPLATE | {
                 "session": {
-                    "modalities": ["text", "audio"],
-                    "instructions": f"""You are a helpful voice assistant for the webpage '{page_title}'. 
-                    Your knowledge is strictly limited to the information provided below.
-
-                    PAGE CONTEXT:
-                    {page_context}
-
-                    Rules:
-                    1. Be brief but complete - keep responses under 7 seconds,  and make it as to the point as possible.
-                    2. Only answer questions about the page content above
-                    3. If asked about anything not on this page, say: "I can only answer questions about the content on this page. You could ask me about our core technologies, for example."
-                    4. Be conversational and helpful
-                    5. Always give responce to the point not a long story.
-                    6. If the user language is hindi, speek hindi but not perfect hindi that user wont understand, use basic hindi only.
-                    """,
-                    "voice": "shimmer",
-                    "input_audio_format": "pcm16",
-                    "output_audio_format": "pcm16",
-                    "input_audio_transcription": {"model": "whisper-1"},
-                    "turn_detection": {
-                        "type": "server_vad",
-                        "threshold": 0.5,
-                        "prefix_padding_ms": 300,
-                        "silence_duration_ms": 200
-                    },
-                    "temperature": 0.8,
-                    "max_response_output_tokens": 500
+                    **_SESSION_CONFIG_TEMPLATE["session"],
+                    "instructions": _INSTRUCTIONS_TEMPLATE.format(page_title=page_title, page_context=page_context)
                 }
             }
-            await openai_ws.send(json.dumps(session_config))
-            print("[INFO] Sent session configuration to OpenAI")
+            await openai_ws.send(orjson.dumps(session_config).decode())
+            logger.info("Sent session configuration to OpenAI")
             
             # Create tasks for bidirectional communication
             async def forward_to_openai():
                 try:
                     while True:
-                        data = await websocket.receive_text()
-                        await openai_ws.send(data)
+                        # Forward frames as they arrive: text stays text, binary stays binary
+                        message = await websocket.receive()
+                        if message["type"] == "websocket.disconnect":
+                            logger.info("Client disconnected")
+                            break
+                        data = message.get("text")
+                        await openai_ws.send(data if data is not None else message["bytes"])
                 except Exception as e:
-                    print(f"[ERROR] Forward to OpenAI error: {e}")
+                    logger.error("Forward to OpenAI error: %s", e)
             
             async def forward_to_client():
                 try:
                     async for message in openai_ws:
-                        await websocket.send_text(message)
+                        if isinstance(message, (bytes, bytearray)):
+                            await websocket.send_bytes(message)
+                        else:
+                            await websocket.send_text(message)
                 except Exception as e:
-                    print(f"[ERROR] Forward to client error: {e}")
+                    logger.error("Forward to client error: %s", e)
             
-            # Run both tasks concurrently
-            await asyncio.gather(
-                forward_to_openai(),
-                forward_to_client()
-            )
+            # Run both directions concurrently; as soon as either side finishes
+            # (disconnect or error), cancel the other so neither socket lingers.
+            # The finally also covers this handler being cancelled (e.g. server shutdown).
+            tasks = {asyncio.create_task(forward_to_openai()), asyncio.create_task(forward_to_client())}
+            try:
+                await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            finally:
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
     
     except WebSocketDisconnect:
-        print("[INFO] Client disconnected")
+        logger.info("Client disconnected")
     except Exception as e:
-        print(f"[ERROR] WebSocket proxy error: {e}")
+        logger.error("WebSocket proxy error: %s", e)
         try:
             await websocket.close()
         except:
@@ -354,5 +482,17 @@ async def root():
 # --- Server Execution ---
 if __name__ == "__main__":
     # For development, run with: uvicorn app:app --reload
-    uvicorn.run(app, host="127.0.0.1", port=5000)
+    # One worker process per core (override with WEB_CONCURRENCY). "auto" picks uvloop and
+    # httptools when installed (uvicorn[standard]) and falls back to asyncio/h11 elsewhere.
+    # The page and knowledge-base caches are in-process, so each worker keeps its own copy.
+    uvicorn.run(
+        "app:app",
+        host="127.0.0.1",
+        port=5000,
+        workers=int(os.getenv("WEB_CONCURRENCY", os.cpu_count() or 1)),
+        loop="auto",
+        http="auto",
+        ws="websockets",
+        log_level="info"
+    )
 
@@ -0,0 +1,36 @@
+import aiohttp
+from typing import Optional
+
+# --- Shared HTTP client for direct calls to the OpenAI REST API ---
+OPENAI_API_BASE = "https://api.openai.com/v1"
+
+# Default for request/response calls, matching the OpenAI SDK's 600 s overall limit
+DEFAULT_TIMEOUT = aiohttp.ClientTimeout(total=600, connect=10)
+# Streamed bodies and uploads have no overall cap; only connecting and each read are bounded
+STREAM_TIMEOUT = aiohttp.ClientTimeout(total=None, connect=10, sock_read=120)
+
+_http_session: Optional[aiohttp.ClientSession] = None
+
+
+async def get_http_session() -> aiohttp.ClientSession:
+    """
+    Returns the process-wide aiohttp session, creating it on first use.
+    Reusing one session keeps connections to api.openai.com pooled and alive.
+    """
+    global _http_session
+    if _http_session is None or _http_session.closed:
+        _http_session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=100, ttl_dns_cache=300),
+            timeout=DEFAULT_TIMEOUT
+        )
+    return _http_session
+
+
+async def close_http_session():
+    """
+    Closes the shared aiohttp session, if one was opened.
+    """
+    global _http_session
+    if _http_session is not None:
+        await _http_session.close()
+        _http_session = None
@@ -1,21 +1,142 @@
 import os
-import json
+import re
+import logging
+import functools
+import orjson
 import asyncio
 import websockets
 from openai import AsyncOpenAI
 from dotenv import load_dotenv
-import base64
-import aiohttp
+import pybase64
 
-# Load environment variables
-load_dotenv()
+from http_session import OPENAI_API_BASE, get_http_session
+
+logger = logging.getLogger(__name__)
+
+def log_base64_backend():
+    """
+    Logs the pybase64 build used for audio frames; the version string names the selected ISA (e.g. AVX2).
+    Called once logging is configured, since records emitted at import time would be dropped.
+    """
+    logger.debug("Using %s", pybase64.get_version())
+
+# Load environment variables, skipping the .env read when the key is already set
+if not os.getenv("OPENAI_API_KEY"):
+    load_dotenv()
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 
 if not OPENAI_API_KEY:
     raise ValueError("OPENAI_API_KEY not found in environment variables")
 
-# Initialize OpenAI client
-client = AsyncOpenAI(api_key=OPENAI_API_KEY)
+# OpenAI client, initialized on first use (only needed for session cleanup)
+@functools.lru_cache(maxsize=1)
+def _client():
+    return AsyncOpenAI(api_key=OPENAI_API_KEY)
+
+# Static part of the session instructions; only the page title and context change per session
+SESSION_INSTRUCTIONS_TEMPLATE = """
+                You are a helpful voice assistant for the webpage '{page_title}'. 
+                Your knowledge is strictly limited to the information provided below.
+                
+                PAGE CONTEXT:
+                {page_context}
+                
+                Rules:
+                1. Be extremely brief - responses should be under 10 seconds (25-30 words max)
+                2. Only answer questions about the page content above
+                3. If asked about anything not on this page, say: "I can only answer questions about the content on this page. You could ask me about our core technologies, for example."
+                4. Be conversational and helpful
+                """
+
+# --- Pre-encoded POST /realtime/sessions body ---
+SESSION_HEADERS = {
+    "Authorization": f"Bearer {OPENAI_API_KEY}",
+    "Content-Type": "application/json"
+}
+SESSION_PARAMS = {
+    "model": "gpt-4o-realtime-preview-2024-12-17",
+    "voice": "shimmer",
+    "temperature": 0.8,
+    "max_response_output_tokens": 100
+}
+
+def _json_escape(text: str) -> bytes:
+    """
+    Returns text encoded as the inside of a JSON string literal (no surrounding quotes).
+    """
+    return orjson.dumps(text)[1:-1]
+
+# The body is {...SESSION_PARAMS, "instructions": "<template>"}, split around the two placeholders
+_before_title, _rest = SESSION_INSTRUCTIONS_TEMPLATE.split("{page_title}")
+_between, _after_context = _rest.split("{page_context}")
+_SESSION_BODY_HEAD = orjson.dumps(SESSION_PARAMS)[:-1] + b',"instructions":"' + _json_escape(_before_title)
+_SESSION_BODY_MID = _json_escape(_between)
+_SESSION_BODY_TAIL = _json_escape(_after_context) + b'"}'
+
+@functools.lru_cache(maxsize=32)
+def _build_session_payload(page_title: str, page_context: str) -> bytes:
+    """
+    Returns the serialized session body; repeat sessions for the same page reuse the cached bytes.
+    page_context is the str cached with the page parse in app.py, so its hash is computed only once.
+    """
+    # Only the page title and context are JSON-escaped here; the rest of the body is pre-encoded
+    return b"".join((
+        _SESSION_BODY_HEAD, _json_escape(page_title),
+        _SESSION_BODY_MID, _json_escape(page_context),
+        _SESSION_BODY_TAIL
+    ))
+
+# --- Handlers for incoming Realtime events, looked up by event "type" ---
+def _on_user_speech_started(data: dict | None):
+    logger.debug("User started speaking")
+
+def _on_user_speech_stopped(data: dict | None):
+    logger.debug("User stopped speaking")
+
+def _on_assistant_speech_started(data: dict | None):
+    logger.debug("Assistant started speaking")
+
+def _on_assistant_speech_stopped(data: dict | None):
+    logger.debug("Assistant finished speaking")
+
+def _on_error(data: dict):
+    logger.error("Realtime API error: %s", data.get("error"))
+
+# Event types whose handlers don't look at the payload
+_NO_PAYLOAD_TYPES = frozenset((
+    "conversation.item.input_audio_buffer.speech_started",
+    "conversation.item.input_audio_buffer.speech_stopped",
+    "conversation.item.output_audio_buffer.speech_started",
+    "conversation.item.output_audio_buffer.speech_stopped",
+))
+
+# Realtime events lead with their "type" field, so it can be read without parsing the frame
+_TYPE_RE = re.compile(rb'"type"\s*:\s*"([^"]+)"')
+
+def _peek_type(raw: bytes):
+    """
+    Returns the event type from the first 128 bytes of a raw frame, or None.
+    """
+    match = _TYPE_RE.search(raw, 0, 128)
+    return match.group(1).decode() if match else None
+
+# --- Fixed JSON around the base64 payload of an audio append event ---
+_APPEND_AUDIO_PREFIX = b'{"type":"conversation.item.input_audio_buffer.append","item":{"type":"input_audio_buffer","audio":"'
+_APPEND_AUDIO_SUFFIX = b'"}}'
+
+# Small audio chunks are coalesced into one append frame: flush at ~100 ms of 16 kHz pcm16,
+# or 50 ms after the first buffered chunk, whichever comes first
+_AUDIO_FLUSH_BYTES = 3200
+_AUDIO_FLUSH_DELAY = 0.05
+
+_HANDLERS = {
+    "conversation.item.input_audio_buffer.speech_started": _on_user_speech_started,
+    "conversation.item.input_audio_buffer.speech_stopped": _on_user_speech_stopped,
+    "conversation.item.output_audio_buffer.speech_started": _on_assistant_speech_started,
+    "conversation.item.output_audio_buffer.speech_stopped": _on_assistant_speech_stopped,
+    "error": _on_error,
+}
+
 
 class RealtimeVoiceAssistant:
     def __init__(self):
@@ -23,6 +144,10 @@ class RealtimeVoiceAssistant:
         self.websocket = None
         self.session_id = None
         self.is_connected = False
+        self._pending = bytearray()
+        self._flush_timer = None
+        self._flush_task = None
+        self._flush_failed = False
         
     async def create_session(self, page_context: str, page_title: str):
         """
@@ -30,53 +155,31 @@ class RealtimeVoiceAssistant:
         """
         try:
             # Create the session using direct HTTP request
-            url = "https://api.openai.com/v1/realtime/sessions"
-            headers = {
-                "Authorization": f"Bearer {OPENAI_API_KEY}",
-                "Content-Type": "application/json"
-            }
-            payload = {
-                "model": "gpt-4o-realtime-preview-2024-12-17",
-                "voice": "shimmer",
-                "instructions": f"""
-                You are a helpful voice assistant for the webpage '{page_title}'. 
-                Your knowledge is strictly limited to the information provided below.
+            url = f"{OPENAI_API_BASE}/realtime/sessions"
+            payload = _build_session_payload(page_title, page_context)
+            
+            # Reuse the pooled session so keep-alive connections skip the TCP/TLS handshake
+            session = await get_http_session()
+            async with session.post(url, headers=SESSION_HEADERS, data=payload) as response:
+                if response.status != 200:
+                    error_text = await response.text()
+                    logger.error("Failed to create session: %s - %s", response.status, error_text)
+                    return None
                 
-                PAGE CONTEXT:
-                {page_context}
+                session_data = await response.json()
                 
-                Rules:
-                1. Be extremely brief - responses should be under 10 seconds (25-30 words max)
-                2. Only answer questions about the page content above
-                3. If asked about anything not on this page, say: "I can only answer questions about the content on this page. You could ask me about our core technologies, for example."
-                4. Be conversational and helpful
-                """,
-                "temperature": 0.8,
-                "max_response_output_tokens": 100
-            }
-            
-            async with aiohttp.ClientSession() as session:
-                async with session.post(url, headers=headers, json=payload) as response:
-                    if response.status != 200:
-                        error_text = await response.text()
-                        # debuggers ---->
-                        # print(f"[ERROR] Failed to create session: {response.status} - {error_text}")
-                        return None
-                    
-                    session_data = await response.json()
-                    
-                    self.client_secret = session_data["client_secret"]["value"]
-                    self.session_id = session_data["id"]
-                    self.model = session_data.get("model", "gpt-realtime")
-                    
-                    # print(f"[SUCCESS] Created Realtime session: {self.session_id} with model: {self.model}")
-                    return {
-                        "client_secret": self.client_secret,
-                        "model": self.model
-                    }
+                self.client_secret = session_data["client_secret"]["value"]
+                self.session_id = session_data["id"]
+                self.model = session_data.get("model", "gpt-realtime")
+                
+                logger.info("Created Realtime session: %s with model: %s", self.session_id, self.model)
+                return {
+                    "client_secret": self.client_secret,
+                    "model": self.model
+                }
             
         except Exception as e:
-            # print(f"[ERROR] Failed to create Realtime session: {e}")
+            logger.error("Failed to create Realtime session: %s", e)
             return None
     
     async def connect_to_session(self, client_secret: str):
@@ -87,16 +190,23 @@ class RealtimeVoiceAssistant:
             # Connect to the Realtime API WebSocket
             ws_url = f"wss://api.openai.com/v1/realtime?model=gpt-4o-realtime-preview-2024-10-01&client_secret={client_secret}"
             
-            self.websocket = await websockets.connect(ws_url)
+            # Audio arrives as base64 text that deflate barely shrinks, so skip compression
+            self.websocket = await websockets.connect(
+                ws_url,
+                compression=None,
+                max_size=2**22,
+                ping_interval=20,
+                ping_timeout=20
+            )
             self.is_connected = True
             
-            # print("[SUCCESS] Connected to Realtime WebSocket")
+            logger.info("Connected to Realtime WebSocket")
             
             # Start listening for messages
             await self.listen_for_messages()
             
         except Exception as e:
-            # print(f"[ERROR] Failed to connect to Realtime session: {e}")
+            logger.error("Failed to connect to Realtime session: %s", e)
             self.is_connected = False
             return False
     
@@ -105,58 +215,106 @@ class RealtimeVoiceAssistant:
         Listens for incoming messages from the Realtime API
         """
         try:
-            async for message in self.websocket:
-                data = json.loads(message)
+            while True:
+                # Raw bytes: no UTF-8 decode for frames that are never fully parsed
+                message = await self.websocket.recv(decode=False)
                 
-                if data.get("type") == "conversation.item.input_audio_buffer.speech_started":
-                    # print("[INFO] User started speaking")
-                    
-                elif data.get("type") == "conversation.item.input_audio_buffer.speech_stopped":
-                    # print("[INFO] User stopped speaking")
-                    
-                elif data.get("type") == "conversation.item.output_audio_buffer.speech_started":
-                    # print("[INFO] Assistant started speaking")
-                    
-                elif data.get("type") == "conversation.item.output_audio_buffer.speech_stopped":
-                    # print("[INFO] Assistant finished speaking")
-                    
-                elif data.get("type") == "error":
-                    # print(f"[ERROR] Realtime API error: {data.get('error')}")
+                # Status events carry nothing we use, so dispatch them on the peeked type alone
+                msg_type = _peek_type(message)
+                if msg_type in _NO_PAYLOAD_TYPES:
+                    _HANDLERS[msg_type](None)
+                    continue
+                
+                data = orjson.loads(message)
+                handler = _HANDLERS.get(data.get("type"))
+                if handler:
+                    handler(data)
                     
         except websockets.exceptions.ConnectionClosed:
-            # print("[INFO] WebSocket connection closed")
+            logger.info("WebSocket connection closed")
             self.is_connected = False
         except Exception as e:
-            # print(f"[ERROR] Error listening for messages: {e}")
+            logger.error("Error listening for messages: %s", e)
             self.is_connected = False
     
     async def send_audio(self, audio_data: bytes):
         """
-        Sends audio data to the Realtime API
+        Buffers audio data for the Realtime API, sending it once enough has accumulated
         """
         if not self.is_connected or not self.websocket:
-            print("[ERROR] Not connected to Realtime session")
+            logger.error("Not connected to Realtime session")
             return False
             
-        try:
-            # Encode audio as base64
-            audio_base64 = base64.b64encode(audio_data).decode('utf-8')
+        # Report a failed timer flush to the next caller instead of dropping it
+        if self._flush_failed or (self._flush_task is not None and self._flush_task.done()):
+            if not await self._wait_for_timer_flush():
+                return False
             
-            # Send audio data
-            message = {
-                "type": "conversation.item.input_audio_buffer.append",
-                "item": {
-                    "type": "input_audio_buffer",
-                    "audio": audio_base64
-                }
-            }
+        self._pending.extend(audio_data)
+        if len(self._pending) >= _AUDIO_FLUSH_BYTES:
+            # Keep frames in order behind a timer flush that is still sending
+            if not await self._wait_for_timer_flush():
+                return False
+            return await self._flush()
+        if self._flush_timer is None:
+            self._flush_timer = asyncio.get_running_loop().call_later(
+                _AUDIO_FLUSH_DELAY, self._on_flush_timer
+            )
+        return True
+    
+    def _on_flush_timer(self):
+        """
+        Sends whatever audio is buffered when the flush delay expires
+        """
+        self._flush_timer = None
+        if self._flush_task is not None and not self._flush_task.done():
+            # The previous timer flush is still sending; try again after it rather than racing it
+            self._flush_timer = asyncio.get_running_loop().call_later(
+                _AUDIO_FLUSH_DELAY, self._on_flush_timer
+            )
+            return
+        # Keep a reference so the task isn't garbage collected
+        self._flush_task = asyncio.ensure_future(self._timer_flush())
+    
+    async def _timer_flush(self):
+        """
+        Flushes from the timer, recording a failure for the next caller to report
+        """
+        if not await self._flush():
+            self._flush_failed = True
+    
+    async def _wait_for_timer_flush(self):
+        """
+        Waits for a flush started by the timer, if any. Returns False if a timer flush
+        failed since the last check
+        """
+        task, self._flush_task = self._flush_task, None
+        if task is not None:
+            await task
+        failed, self._flush_failed = self._flush_failed, False
+        return not failed
+    
+    async def _flush(self):
+        """
+        Sends all buffered audio to the Realtime API as a single append event
+        """
+        if self._flush_timer is not None:
+            self._flush_timer.cancel()
+            self._flush_timer = None
+        if not self._pending:
+            return True
             
-            await self.websocket.send(json.dumps(message))
-            # print("[SUCCESS] Audio sent to Realtime API")
+        try:
+            # Base64 needs no JSON escaping, so the frame is the fixed prefix/suffix around
+            # the encoded audio, sent as a text frame without a bytes -> str round-trip
+            frame = _APPEND_AUDIO_PREFIX + pybase64.b64encode(self._pending) + _APPEND_AUDIO_SUFFIX
+            self._pending.clear()
+            await self.websocket.send(frame, text=True)
+            logger.debug("Audio sent to Realtime API")
             return True
             
         except Exception as e:
-            # print(f"[ERROR] Failed to send audio: {e}")
+            logger.error("Failed to send audio: %s", e)
             return False
     
     async def commit_audio(self):
@@ -167,26 +325,35 @@ class RealtimeVoiceAssistant:
             return False
             
         try:
+            # Buffered audio has to reach the server before the commit does
+            if not await self._wait_for_timer_flush() or not await self._flush():
+                return False
             message = {
                 "type": "conversation.item.input_audio_buffer.commit"
             }
             
-            await self.websocket.send(json.dumps(message))
-            # print("[SUCCESS] Audio buffer committed")
+            await self.websocket.send(orjson.dumps(message).decode())
+            logger.debug("Audio buffer committed")
             return True
             
         except Exception as e:
-            # print(f"[ERROR] Failed to commit audio: {e}")
+            logger.error("Failed to commit audio: %s", e)
             return False
     
     async def disconnect(self):
         """
         Disconnects from the Realtime session
         """
+        if self._flush_timer is not None:
+            self._flush_timer.cancel()
+            self._flush_timer = None
+        # Let an in-flight timer flush finish before the socket closes under it
+        await self._wait_for_timer_flush()
+        self._pending.clear()
         if self.websocket:
             await self.websocket.close()
             self.is_connected = False
-            # print("[INFO] Disconnected from Realtime session")
+            logger.info("Disconnected from Realtime session")
     
     async def cleanup_session(self):
         """
@@ -194,10 +361,10 @@ class RealtimeVoiceAssistant:
         """
         try:
             if self.session_id:
-                await client.beta.realtime.sessions.delete(self.session_id)
-                # print(f"[SUCCESS] Cleaned up session: {self.session_id}")
+                await _client().beta.realtime.sessions.delete(self.session_id)
+                logger.info("Cleaned up session: %s", self.session_id)
         except Exception as e:
-            # print(f"[ERROR] Failed to cleanup session: {e}")
+            logger.error("Failed to cleanup session: %s", e)
 
 
 # Global instance for the voice assistant
@@ -1,15 +1,26 @@
 import os
+import logging
+import io
 import sounddevice as sd
 import numpy as np
 import wave
 import dotenv
 import threading
+import functools
 import queue
 import time
-from openai import OpenAI, AsyncOpenAI 
+import aiohttp
+import orjson
+from openai import OpenAI
+
+from http_session import OPENAI_API_BASE, STREAM_TIMEOUT, get_http_session
+
+logger = logging.getLogger(__name__)
 
 # --- Configuration ---
-dotenv.load_dotenv()
+# Only read .env when the key isn't already provided by the environment
+if not os.getenv("OPENAI_API_KEY"):
+    dotenv.load_dotenv()
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 
 # Check if the API key is available
@@ -17,10 +28,13 @@ if not OPENAI_API_KEY:
     raise ValueError("OPENAI_API_KEY not found in environment variables. Please set it in your .env file.")
 
 # --- Clients for different contexts ---
-# Sync client for the command-line part of the script
-sync_client = OpenAI(api_key=OPENAI_API_KEY)
-# Async client for use with FastAPI
-async_client = AsyncOpenAI(api_key=OPENAI_API_KEY)
+# Sync client for the command-line part of the script, built on first use
+@functools.lru_cache(maxsize=1)
+def _sync_client():
+    return OpenAI(api_key=OPENAI_API_KEY)
+
+# FastAPI calls go straight to the REST API over the shared aiohttp session
+HEADERS = {"Authorization": f"Bearer {OPENAI_API_KEY}"}
 
 
 async def transcribe_audio_file(audio_file, filename: str):
@@ -28,15 +42,18 @@ async def transcribe_audio_file(audio_file, filename: str):
     Transcribes an audio file using OpenAI's Whisper model.
     """
     try:
-        # The OpenAI library can take a tuple of (filename, file_content)
-        # to correctly identify the file type.
-        transcription = await async_client.audio.transcriptions.create(
-            model="whisper-1",
-            file=(filename, audio_file.read()),
-        )
-        return transcription.text
+        # The filename on the multipart field lets the API identify the file type.
+        form = aiohttp.FormData()
+        form.add_field("model", "whisper-1")
+        form.add_field("file", audio_file.read(), filename=filename)
+        session = await get_http_session()
+        async with session.post(f"{OPENAI_API_BASE}/audio/transcriptions", headers=HEADERS, data=form, timeout=STREAM_TIMEOUT) as response:
+            body = await response.read()
+            if response.status != 200:
+                raise RuntimeError(f"{response.status} - {body.decode('utf-8', 'replace')}")
+        return orjson.loads(body)["text"]
     except Exception as e:
-        print(f"[ERROR] STT failed in async function: {e}")
+        logger.error("STT failed in async function: %s", e)
         return None
 
 
@@ -50,83 +67,123 @@ DTYPE = 'int16'
 # Detection settings
 PAUSE_DURATION_SECONDS = 1.0  # How long of a silence triggers transcription
 SILENCE_THRESHOLD = 300  # Adjust this based on your microphone's noise level
-TEMP_AUDIO_FILE = "temp_input.wav"
+# rms > SILENCE_THRESHOLD  <=>  sum of squares over a block > SILENCE_THRESHOLD^2 * samples per block
+SILENCE_THRESHOLD_SUM_SQ = SILENCE_THRESHOLD * SILENCE_THRESHOLD * BLOCK_SIZE * CHANNELS
+
+# Recording buffer, preallocated once; blocks are copied in at write_index
+MAX_RECORDING_SECONDS = 30
 
 # Global state
-audio_buffer = []
+# Single producer, single consumer: only the audio callback writes audio_buffer/write_index while
+# the stream is open, and the main thread only reads them after the stream has been closed
+audio_buffer = np.empty((SAMPLE_RATE * MAX_RECORDING_SECONDS, CHANNELS), dtype=DTYPE)
+write_index = 0
+# int64 scratch for the per-block energy check, so the callback doesn't allocate a widened copy
+energy_scratch = np.empty(BLOCK_SIZE * CHANNELS, dtype=np.int64)
 is_speaking = False
 silent_chunks_count = 0
 stt_result_queue = queue.Queue()
-stop_listening_flag = False
-
-
-def transcribe_and_queue_sync(filename):
-    """Transcribes saved audio using OpenAI API (sync version for CLI)."""
+# Status events from the audio callback, printed by the main thread so the callback never blocks on I/O;
+# a final "stop" event wakes the main thread as soon as the phrase is over
+status_queue = queue.Queue()
+STOP_EVENT = "stop"
+STATUS_MESSAGES = {
+    "speaking": ("[INFO] Speaking detected...", ""),
+    "silence_tick": (".", ""),
+    "max_length": ("\n[WARN] Maximum recording length reached. Finishing...", "\n"),
+    "silence": ("\n[INFO] Silence detected. Finishing...", "\n"),
+}
+
+
+def transcribe_and_queue_sync(pcm_bytes):
+    """Wraps recorded PCM in an in-memory WAV and transcribes it using OpenAI API (sync version for CLI)."""
     print("\n[INFO] Transcribing speech...")
     try:
-        with open(filename, "rb") as f:
-            response = sync_client.audio.transcriptions.create(
-                model="whisper-1",
-                file=f
-            )
+        wav_buffer = io.BytesIO()
+        with wave.open(wav_buffer, 'wb') as wf:
+            wf.setnchannels(CHANNELS)
+            wf.setsampwidth(2) # 2 bytes for int16
+            wf.setframerate(SAMPLE_RATE)
+            wf.writeframes(pcm_bytes)
+        response = _sync_client().audio.transcriptions.create(
+            model="whisper-1",
+            file=("audio.wav", wav_buffer.getvalue())
+        )
         stt_result_queue.put(response.text)
     except Exception as e:
         print(f"[ERROR] Transcription failed: {e}")
         stt_result_queue.put(None)
 
 
-def save_and_transcribe():
-    """Saves the current buffer to a WAV and starts transcription."""
-    global audio_buffer
-    if not audio_buffer:
-        return
+def append_to_buffer(indata):
+    """Copies one block into the preallocated buffer. Returns False once the buffer is full."""
+    global write_index
+    n = indata.shape[0]
+    if write_index + n > len(audio_buffer):
+        return False
+    # indata is only valid during the callback; copy it straight into the buffer (same dtype, C-contiguous)
+    np.copyto(audio_buffer[write_index:write_index + n], indata)
+    write_index += n
+    return True
 
-    full_audio_data = np.concatenate(audio_buffer, axis=0)
-    audio_buffer = []
 
-    with wave.open(TEMP_AUDIO_FILE, 'wb') as wf:
-        wf.setnchannels(CHANNELS)
-        wf.setsampwidth(2) # 2 bytes for int16
-        wf.setframerate(SAMPLE_RATE)
-        wf.writeframes(full_audio_data.tobytes())
+def print_status(event):
+    """Prints a status event queued by the audio callback."""
+    text, end = STATUS_MESSAGES[event]
+    print(text, end=end, flush=True)
 
-    threading.Thread(target=transcribe_and_queue_sync, args=(TEMP_AUDIO_FILE,), daemon=True).start()
+
+def save_and_transcribe():
+    """Snapshots the recorded audio and starts transcription on a background thread."""
+    global write_index
+    if write_index == 0:
+        return
+    pcm_bytes = audio_buffer[:write_index].tobytes()
+    write_index = 0
+
+    # Daemon thread, so Ctrl+C during an upload exits without waiting for the API call
+    threading.Thread(target=transcribe_and_queue_sync, args=(pcm_bytes,), daemon=True).start()
 
 
 def listen_once():
     """Listen for one phrase and return transcription."""
-    global audio_buffer, is_speaking, silent_chunks_count, stop_listening_flag
-    audio_buffer = []
+    global write_index, is_speaking, silent_chunks_count
+    write_index = 0
     is_speaking = False
     silent_chunks_count = 0
-    stop_listening_flag = False
     
-    # Clear the queue before starting
+    # Clear the queues before starting
     while not stt_result_queue.empty():
         stt_result_queue.get()
+    while not status_queue.empty():
+        status_queue.get()
 
     def audio_callback(indata, frames, time_info, status):
         """Callback called by sounddevice for each chunk."""
-        global is_speaking, silent_chunks_count, audio_buffer, stop_listening_flag
+        global is_speaking, silent_chunks_count
 
-        # Use absolute values for RMS calculation
-        volume_rms = np.sqrt(np.mean(np.abs(indata.astype(np.float32)) ** 2))
-        is_sound = volume_rms > SILENCE_THRESHOLD
+        # Compare the block's integer sum of squares against a precomputed threshold
+        # (no float copy, mean or sqrt); int64 so 1024 squared int16 samples cannot overflow
+        samples = energy_scratch[:frames * CHANNELS]
+        np.copyto(samples, indata.reshape(-1))
+        is_sound = int(np.dot(samples, samples)) > SILENCE_THRESHOLD_SUM_SQ
 
         if is_sound:
             if not is_speaking:
-                print("[INFO] Speaking detected...", end='', flush=True)
+                status_queue.put_nowait("speaking")
             is_speaking = True
             silent_chunks_count = 0
-            audio_buffer.append(indata.copy())
+            if not append_to_buffer(indata):
+                status_queue.put_nowait("max_length")
+                status_queue.put_nowait(STOP_EVENT)
         elif is_speaking:
-            print(".", end='', flush=True)
-            audio_buffer.append(indata.copy()) # Continue recording during brief pauses
+            status_queue.put_nowait("silence_tick")
+            append_to_buffer(indata) # Continue recording during brief pauses
             silent_chunks_count += 1
             num_pause_blocks = int((PAUSE_DURATION_SECONDS * SAMPLE_RATE) / BLOCK_SIZE)
             if silent_chunks_count > num_pause_blocks:
-                print("\n[INFO] Silence detected. Finishing...")
-                stop_listening_flag = True
+                status_queue.put_nowait("silence")
+                status_queue.put_nowait(STOP_EVENT)
 
     print("\n" + "="*50)
     print("[INFO] Listening... Speak now.")
@@ -137,10 +194,18 @@ def listen_once():
         blocksize=BLOCK_SIZE,
         callback=audio_callback
     ):
-        while not stop_listening_flag:
-            time.sleep(0.1)
-
-    # Save and transcribe after speech ends
+        # Print status events as they arrive until the callback queues the stop event; the timeout
+        # only keeps Ctrl+C responsive on platforms where a bare get() can't be interrupted
+        while True:
+            try:
+                event = status_queue.get(timeout=1.0)
+            except queue.Empty:
+                continue
+            if event == STOP_EVENT:
+                break
+            print_status(event)
+
+    # Save and transcribe after speech ends; closing the stream has stopped the callback
     save_and_transcribe()
 
     # Wait for transcription thread
@@ -166,6 +231,3 @@ if __name__ == "__main__":
             time.sleep(1)
     except KeyboardInterrupt:
         print("\n[INFO] Stopped by user. Exiting gracefully.")
-    finally:
-        if os.path.exists(TEMP_AUDIO_FILE):
-            os.remove(TEMP_AUDIO_FILE)
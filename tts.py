@@ -1,37 +1,48 @@
 import os
-from openai import AsyncOpenAI  # Use the async client for FastAPI
+import logging
+import orjson
 import dotenv
 from pathlib import Path
 
+from http_session import OPENAI_API_BASE, STREAM_TIMEOUT, get_http_session
+
+logger = logging.getLogger(__name__)
+
 # --- Configuration ---
-dotenv.load_dotenv()
+# Only read .env when the key isn't already provided by the environment
+if not os.getenv("OPENAI_API_KEY"):
+    dotenv.load_dotenv()
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 
 # Check if the API key is available
 if not OPENAI_API_KEY:
     raise ValueError("OPENAI_API_KEY not found in environment variables. Please set it in your .env file.")
 
-# Use the async client
-client = AsyncOpenAI(api_key=OPENAI_API_KEY)
+# Headers for direct calls to the OpenAI REST API
+HEADERS = {
+    "Authorization": f"Bearer {OPENAI_API_KEY}",
+    "Content-Type": "application/json"
+}
 
 
-async def text_to_speech_stream(text_to_speak: str, model: str = "tts-1", voice: str = "shimmer"):
+async def text_to_speech_stream(text_to_speak: str, model: str = "tts-1", voice: str = "shimmer", response_format: str = "mp3"):
     """
     Converts text into an audio stream using OpenAI's TTS API.
-    This is an async generator that yields audio chunks.
+    This is an async generator that yields audio chunks as they arrive on the socket.
     """
     try:
-        response = await client.audio.speech.create(
-            model=model,
-            voice=voice,
-            input=text_to_speak
-        )
-        # FIX: The aiter_bytes() method is a coroutine and must be awaited
-        async for chunk in await response.aiter_bytes():
-            yield chunk
+        session = await get_http_session()
+        payload = {"model": model, "voice": voice, "input": text_to_speak, "response_format": response_format}
+        async with session.post(f"{OPENAI_API_BASE}/audio/speech", headers=HEADERS, data=orjson.dumps(payload), timeout=STREAM_TIMEOUT) as response:
+            if response.status != 200:
+                error_text = await response.text()
+                raise RuntimeError(f"{response.status} - {error_text}")
+            # iter_any() hands over whatever bytes have arrived instead of waiting to fill a fixed-size chunk
+            async for chunk in response.content.iter_any():
+                yield chunk
 
     except Exception as e:
-        print(f"\n[ERROR] Failed to generate speech: {e}")
+        logger.error("Failed to generate speech: %s", e)
         yield b""
 
 async def chat_with_openai(user_prompt: str, system_prompt: str = "You are a helpful assistant, ans not more than 50 words."):
@@ -46,20 +57,25 @@ async def chat_with_openai(user_prompt: str, system_prompt: str = "You are a hel
         str: The assistant's text response, or None if an error occurs.
     """
     try:
-        print("\n[INFO] Getting response from OpenAI chat...")
-        response = await client.chat.completions.create(
-            model="gpt-4o",
-            messages=[
+        logger.info("Getting response from OpenAI chat...")
+        session = await get_http_session()
+        payload = {
+            "model": "gpt-4o",
+            "messages": [
                 {"role": "system", "content": system_prompt},
                 {"role": "user", "content": user_prompt}
             ],
-            temperature=0.7
-        )
-        assistant_response = response.choices[0].message.content
-        print("[SUCCESS] Response received.")
+            "temperature": 0.7
+        }
+        async with session.post(f"{OPENAI_API_BASE}/chat/completions", headers=HEADERS, data=orjson.dumps(payload)) as response:
+            body = await response.read()
+            if response.status != 200:
+                raise RuntimeError(f"{response.status} - {body.decode('utf-8', 'replace')}")
+        assistant_response = orjson.loads(body)["choices"][0]["message"]["content"]
+        logger.info("Response received.")
         return assistant_response
     except Exception as e:
-        print(f"[ERROR] Failed to chat with OpenAI: {e}")
+        logger.error("Failed to chat with OpenAI: %s", e)
         return None
 
 